@@ -6,8 +6,9 @@ Base = declarative_base()
 
 class Reservations(Base):
     __tablename__ = 'reservations'
+    __table_args__ = (sqlalchemy.Index('ix_reservations_name_start_datetime', 'name', 'start_datetime'),)
 
     reservation_id = sqlalchemy.Column('reservation_id', sqlalchemy.Integer, primary_key=True, autoincrement=True)
     name = sqlalchemy.Column('name', sqlalchemy.String(60))
-    start_date = sqlalchemy.Column('start_datetime', sqlalchemy.DateTime)
+    start_date = sqlalchemy.Column('start_datetime', sqlalchemy.DateTime, index=True)
     end_date = sqlalchemy.Column('end_datetime', sqlalchemy.DateTime)
@@ -1,29 +1,189 @@
 import csv
 import json
-from datetime import date, datetime, timedelta
-
-from sqlalchemy import create_engine
+import sys
+from bisect import bisect_left, bisect_right, insort_right
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from itertools import groupby
+from operator import attrgetter
+from os import PathLike
+from typing import ContextManager, Optional, TextIO, Union
+
+from sqlalchemy import create_engine, delete, event, insert, select
 from sqlalchemy.orm import sessionmaker
 
 
 import validators
 from models import Base, Reservations
 
+# Reservations are kept sorted by start date and never overlap each other,
+# so the court can be searched with bisect instead of being scanned.
+_start_date = attrgetter('start_date')
+_end_date = attrgetter('end_date')
+_day = attrgetter('day')
+
+_DATETIME_FORMAT = '%d.%m.%Y %H:%M'
+_SHORTEST_PERIOD = timedelta(minutes=30)
+_ONE_HOUR = timedelta(hours=1)
+_ONE_DAY = timedelta(days=1)
+# Source of the current time for the one-hour rule; tests replace it with a fixed clock
+_clock = datetime.now
+
+
+def _format_time(dt: datetime) -> str:
+    """
+    Formats the time of day as HH:MM without going through strftime.
+
+    Parameters
+    ----------
+    dt : datetime
+        The date and time to format.
+
+    Returns
+    -------
+    str
+        The zero-padded hours and minutes.
+    """
+    return f'{dt.hour:02d}:{dt.minute:02d}'
+
+
+def _format_date(day: date) -> str:
+    """
+    Formats a date as DD.MM.YYYY without going through strftime.
+
+    Parameters
+    ----------
+    day : date
+        The date to format.
+
+    Returns
+    -------
+    str
+        The zero-padded day and month followed by the year.
+    """
+    return f'{day.day:02d}.{day.month:02d}.{day.year}'
+
+
+def _week_key(name: str, start_dt: datetime) -> tuple[str, int, int]:
+    """
+    Builds the key under which reservations are counted per person and ISO week.
+
+    Parameters
+    ----------
+    name : str
+        The name of the person.
+    start_dt : datetime
+        The start date and time of the reservation.
+
+    Returns
+    -------
+    tuple[str, int, int]
+        The name, ISO year and ISO week number.
+    """
+    iso = start_dt.isocalendar()
+    return name, iso.year, iso.week
+
+
+def _open_schedule_file(save_file_name: Union[str, PathLike, TextIO],
+                        newline: Optional[str] = None) -> ContextManager[TextIO]:
+    """
+    Opens the file a schedule is saved to, or wraps an already open text file.
+
+    Parameters
+    ----------
+    save_file_name : str, PathLike or TextIO
+        The name of the file to create, or an open text file to write to.
+    newline : str, optional
+        The newline translation used when the file is opened here.
+
+    Returns
+    -------
+    ContextManager[TextIO]
+        A context manager yielding the file. Only a file opened here is closed on exit;
+        a passed-in file object stays open for the caller.
+    """
+    if isinstance(save_file_name, (str, PathLike)):
+        return open(save_file_name, mode='w', encoding='utf-8', newline=newline)
+    return nullcontext(save_file_name)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    Switches a new SQLite connection to write-ahead logging, so commits append
+    to the log instead of syncing a rollback journal and the database file,
+    and keeps temporary sort structures in memory.
+
+    Parameters
+    ----------
+    dbapi_connection
+        The raw DBAPI connection that was just opened.
+    connection_record
+        The pool record holding the connection.
+
+    Returns
+    -------
+    None
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.close()
+    return None
+
 
+@lru_cache
+def _session_factory(connection_string: str) -> sessionmaker:
+    """
+    Creates the engine and schema for a database once per process and returns its session factory.
+    Every TennisCourt using the same database shares the engine and its connection pool.
+
+    Parameters
+    ----------
+    connection_string : str
+        The SQLAlchemy URL of the database.
+
+    Returns
+    -------
+    sessionmaker
+        The session factory bound to the shared engine.
+    """
+    engine = create_engine(connection_string)
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', _set_sqlite_pragmas)
+    Base.metadata.create_all(engine)
+    # create_all skips tables that already exist, so add indexes missing from older databases
+    for index in Reservations.__table__.indexes:
+        index.create(engine, checkfirst=True)
+    return sessionmaker(bind=engine)
+
+
+@dataclass(slots=True, eq=False)
 class Reservation:
-    def __init__(self, name, start_dt, end_dt):
-        self.name = name
-        self.start_date = start_dt
-        self.end_date = end_dt
+    name: str
+    start_date: datetime
+    end_date: datetime
+    # Calendar fields used for the weekly limit and the per-day schedule, computed once
+    iso_year: int = field(init=False, repr=False)
+    iso_week: int = field(init=False, repr=False)
+    day: date = field(init=False, repr=False)
+
+    def __post_init__(self):
+        iso = self.start_date.isocalendar()
+        self.iso_year = iso.year
+        self.iso_week = iso.week
+        self.day = self.start_date.date()
 
 
 class TennisCourt:
-    def __init__(self):
+    def __init__(self, connection_string: str = 'sqlite:///tennis_court.db'):
         self.reservations = []
-        connection_string = 'sqlite:///tennis_court.db'
-        engine = create_engine(connection_string)
-        Base.metadata.create_all(engine)
-        session = sessionmaker(bind=engine)
+        self._week_counts = Counter()
+        self._by_date = defaultdict(list)
+        session = _session_factory(connection_string)
         self.session = session()
 
     def is_period_overlaps(self, start_dt: datetime, end_dt: datetime) -> bool:
@@ -42,10 +202,8 @@ class TennisCourt:
         bool
             True if there is an overlap, False otherwise.
         """
-        for reservation in self.reservations:
-            if start_dt < reservation.end_date and end_dt > reservation.start_date:
-                return True
-        return False
+        idx = bisect_left(self.reservations, end_dt, key=_start_date)
+        return idx > 0 and self.reservations[idx - 1].end_date > start_dt
 
     def is_date_not_available(self, start_dt: datetime) -> bool:
         """
@@ -61,10 +219,8 @@ class TennisCourt:
         bool
             True if the date and time is not available, False otherwise.
         """
-        for reservation in self.reservations:
-            if reservation.start_date <= start_dt < reservation.end_date:
-                return True
-        return False
+        idx = bisect_right(self.reservations, start_dt, key=_start_date)
+        return idx > 0 and self.reservations[idx - 1].end_date > start_dt
 
     def is_two_reservations_per_week(self, name: str, start_dt: datetime) -> bool:
         """
@@ -82,15 +238,10 @@ class TennisCourt:
         bool
             True if the person has reached the reservation limit, False otherwise.
         """
-        counter = 0
-        week_no = datetime.isocalendar(start_dt).week
-        for reservation in self.reservations:
-            if name == reservation.name and datetime.isocalendar(reservation.start_date).week == week_no:
-                counter += 1
-                if counter > 1:
-                    input(f'Sorry, {name} has reached the reservation limit for this week (2).\n'
-                          f'Press enter to return to main menu.')
-                    return True
+        if self._week_counts[_week_key(name, start_dt)] > 1:
+            input(f'Sorry, {name} has reached the reservation limit for this week (2).\n'
+                  f'Press enter to return to main menu.')
+            return True
         return False
 
     def next_available_datetime(self, start_dt: datetime) -> datetime:
@@ -108,8 +259,10 @@ class TennisCourt:
             The next available date and time for a reservation.
         """
         closest_time = start_dt
-        for reservation in self.reservations:
-            if reservation.start_date >= closest_time + timedelta(minutes=30):
+        first_idx = bisect_left(self.reservations, start_dt, key=_end_date)
+        for idx in range(first_idx, len(self.reservations)):
+            reservation = self.reservations[idx]
+            if reservation.start_date >= closest_time + _SHORTEST_PERIOD:
                 return closest_time
             elif closest_time <= reservation.end_date:
                 closest_time = reservation.end_date
@@ -131,10 +284,13 @@ class TennisCourt:
         """
         avl_periods = []
         periods = [30, 60, 90]
+        # Only the first reservation ending after start_dt can limit the period
+        idx = bisect_right(self.reservations, start_dt, key=_end_date)
+        free_until = self.reservations[idx].start_date if idx < len(self.reservations) else None
         for period in periods:
             end_dt = start_dt + timedelta(minutes=period)
-            if self.is_period_overlaps(start_dt, end_dt):
-                break 
+            if free_until is not None and end_dt > free_until:
+                break
             avl_periods.append(period)
         print('\nHow long would you like to book court?\n'
               'Available periods:')
@@ -159,13 +315,10 @@ class TennisCourt:
         -------
         None
         """
-        for idx, reservation in enumerate(self.reservations):
-            if reservation.start_date > start_dt:
-                new_reservation = Reservation(name, start_dt, end_dt)
-                self.reservations.insert(idx, new_reservation)
-                return None
         new_reservation = Reservation(name, start_dt, end_dt)
-        self.reservations.append(new_reservation)
+        insort_right(self.reservations, new_reservation, key=_start_date)
+        insort_right(self._by_date[new_reservation.day], new_reservation, key=_start_date)
+        self._week_counts[name, new_reservation.iso_year, new_reservation.iso_week] += 1
         return None
 
     def is_reservation_cancelled(self, name: str, start_dt: datetime) -> bool:
@@ -185,10 +338,14 @@ class TennisCourt:
         bool
             True if the reservation was successfully canceled, False otherwise.
         """
-        for reservation in self.reservations:
-            if name == reservation.name and start_dt == reservation.start_date:
-                self.reservations.remove(reservation)
+        idx = bisect_left(self.reservations, start_dt, key=_start_date)
+        while idx < len(self.reservations) and self.reservations[idx].start_date == start_dt:
+            if name == self.reservations[idx].name:
+                reservation = self.reservations.pop(idx)
+                self._by_date[reservation.day].remove(reservation)
+                self._week_counts[name, reservation.iso_year, reservation.iso_week] -= 1
                 return True
+            idx += 1
         input('No reservation found for the given name and date.\n'
               'Press enter to return to main menu.')
         return False
@@ -208,31 +365,36 @@ class TennisCourt:
         -------
         None
         """
+        today = date.today()
+        tomorrow = today + _ONE_DAY
+        # Collect the whole schedule and hand it to stdout in a single write
+        lines = []
         current_date = start_dt
         while current_date <= end_dt:
-            if current_date == date.today():
-                print('Today')
-            elif current_date == date.today() + timedelta(days=1):
-                print('Tomorrow')
+            if current_date == today:
+                lines.append('Today\n')
+            elif current_date == tomorrow:
+                lines.append('Tomorrow\n')
             else:
-                print(current_date.strftime("%A, %d %B, %Y"))
-                
-            reservations = [reservation for reservation in self.reservations
-                            if reservation.start_date.date() == current_date]
+                lines.append(current_date.strftime("%A, %d %B, %Y\n"))
+
+            reservations = self._by_date.get(current_date, [])
             if not reservations:
-                print("No reservations\n")
+                lines.append("No reservations\n\n")
             else:
                 for reservation in reservations:
-                    print(f"* {reservation.name} "
-                          f"{reservation.start_date.strftime('%H:%M')} - "
-                          f"{reservation.end_date.strftime('%H:%M')}")
-                print()
-            current_date += timedelta(days=1)
+                    lines.append(f"* {reservation.name} "
+                                 f"{_format_time(reservation.start_date)} - "
+                                 f"{_format_time(reservation.end_date)}\n")
+                lines.append('\n')
+            current_date += _ONE_DAY
+        sys.stdout.write(''.join(lines))
         input('Schedule printed.\n'
               'Press enter to return to main menu.')
         return None
 
-    def save_schedule(self, start_dt: date, end_dt: date, file_format: str, save_file_name: str) -> None:
+    def save_schedule(self, start_dt: date, end_dt: date, file_format: str,
+                      save_file_name: Union[str, PathLike, TextIO]) -> None:
         """
         Saves the schedule of reservations between start and end date to csv or json file.
 
@@ -244,45 +406,52 @@ class TennisCourt:
             The end date to filter reservations.
         file_format : str
             The format of the file to save the schedule. Only 'json' and 'csv' are supported.
-        save_file_name : str
-            The name of the file to save the schedule.
+        save_file_name : str, PathLike or TextIO
+            The name of the file to save the schedule, or an open text file to write it to.
 
         Returns
         -------
         None
         """
-        start_date = start_dt
-        end_date = end_dt
-        filtered_reservations = [reservation for reservation in self.reservations
-                                 if start_date <= reservation.start_date.date() <= end_date]
+        first_idx = bisect_left(self.reservations, datetime.combine(start_dt, time.min), key=_start_date)
+        last_idx = bisect_right(self.reservations, datetime.combine(end_dt, time.max), key=_start_date)
+        # Walk the bisected bounds instead of copying the range into a new list
+        filtered_reservations = (self.reservations[i] for i in range(first_idx, last_idx))
         if file_format == 'csv':
-            with open(save_file_name, mode='w', encoding='utf-8') as csv_file:
-                fieldnames = ['name', 'start_date', 'end_date']
-                writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-                writer.writeheader()
-                for reservation in filtered_reservations:
-                    writer.writerow({'name': reservation.name,
-                                     'start_date': reservation.start_date.strftime("%d.%m.%Y %H:%M"),
-                                     'end_date': reservation.end_date.strftime("%d.%m.%Y %H:%M")})
+            # The csv module writes its own line endings
+            with _open_schedule_file(save_file_name, newline='') as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(('name', 'start_date', 'end_date'))
+                writer.writerows((reservation.name,
+                                  reservation.start_date.strftime(_DATETIME_FORMAT),
+                                  reservation.end_date.strftime(_DATETIME_FORMAT))
+                                 for reservation in filtered_reservations)
         elif file_format == 'json':
-            schedule_by_date = {}
-            for reservation in filtered_reservations:
-                day_date = reservation.start_date.strftime("%d.%m.%Y")
-                appointment = {
+            # Reservations are sorted by start, so each day's reservations are already adjacent
+            schedule_by_date = {
+                _format_date(day): [{
                     "name": reservation.name,
-                    "start_time": reservation.start_date.strftime("%H:%M"),
-                    "end_time": reservation.end_date.strftime("%H:%M")}
-                if day_date not in schedule_by_date:
-                    schedule_by_date[day_date] = [appointment]
-                else:
-                    schedule_by_date[day_date].append(appointment)
-            with open(save_file_name, mode='w', encoding='utf-8') as json_file:
-                json.dump(schedule_by_date, json_file, indent=2)
-        input(f'\n{save_file_name}.{file_format} saved successfully!\n'
-              f'Press enter to return to main menu.')
+                    "start_time": _format_time(reservation.start_date),
+                    "end_time": _format_time(reservation.end_date)} for reservation in day_reservations]
+                for day, day_reservations in groupby(filtered_reservations, key=_day)}
+            with _open_schedule_file(save_file_name) as json_file:
+                json_file.write(json.dumps(schedule_by_date, indent=2))
+        else:
+            input(f'\nUnsupported file format: {file_format}\n'
+                  'Press enter to return to main menu.')
+            return None
+        if isinstance(save_file_name, (str, PathLike)):
+            saved_as = f'{save_file_name}.{file_format}'
+        else:
+            # Streams such as StringIO have no name to show
+            saved_as = getattr(save_file_name, 'name', None)
+            if not isinstance(saved_as, str):
+                saved_as = 'Schedule'
+        input(f'\n{saved_as} saved successfully!\n'
+              'Press enter to return to main menu.')
         return None
 
-    def add_to_database(self, name: str, start_dt: datetime, end_dt: datetime) -> None:
+    def add_to_database(self, name: str, start_dt: datetime, end_dt: datetime, commit: bool = True) -> None:
         """
         Adds a reservation to the database.
 
@@ -294,15 +463,40 @@ class TennisCourt:
             The start date and time of the reservation.
         end_dt : datetime
             The end date and time of the reservation.
+        commit : bool, optional
+            Whether to commit the session and confirm the reservation to the user.
+            Pass False when adding many reservations and commit the session once at the end.
 
         Returns
         -------
         None
         """
         self.session.add(Reservations(name=name, start_date=start_dt, end_date=end_dt))
-        self.session.commit()
-        input(f'Reservation successfully made!\n'
-              f'Press enter to return to main menu.')
+        if commit:
+            self.session.commit()
+            input(f'Reservation successfully made!\n'
+                  f'Press enter to return to main menu.')
+        return None
+
+    def add_many_to_database(self, reservations: list[tuple[str, datetime, datetime]]) -> None:
+        """
+        Adds many reservations to the database with one bulk insert and a single commit.
+
+        Parameters
+        ----------
+        reservations : list[tuple[str, datetime, datetime]]
+            The name, start date and time, and end date and time of each reservation.
+
+        Returns
+        -------
+        None
+        """
+        rows = [{'name': name, 'start_date': start_dt, 'end_date': end_dt}
+                for name, start_dt, end_dt in reservations]
+        # An insert executed without parameter sets would add a single empty row
+        if rows:
+            self.session.execute(insert(Reservations), rows)
+            self.session.commit()
         return None
 
     def subtract_from_database(self, name: str, start_dt: datetime) -> None:
@@ -320,8 +514,13 @@ class TennisCourt:
         -------
         None
         """
-        reservation = self.session.query(Reservations).filter_by(name=name, start_date=start_dt).one()
-        self.session.delete(reservation)
+        # Duplicate rows may exist, so delete exactly one of them by primary key, matching the
+        # single reservation is_reservation_cancelled removes from memory
+        one_reservation_id = (select(Reservations.reservation_id)
+                              .filter_by(name=name, start_date=start_dt)
+                              .limit(1)
+                              .scalar_subquery())
+        self.session.execute(delete(Reservations).where(Reservations.reservation_id == one_reservation_id))
         self.session.commit()
         input('Reservation successfully cancelled!\n'
               'Press enter to return to main menu.')
@@ -335,7 +534,18 @@ class TennisCourt:
         -------
         None
         """
-        self.reservations = self.session.query(Reservations).order_by(Reservations.start_date).all()
+        rows = self.session.execute(select(Reservations.name, Reservations.start_date, Reservations.end_date)
+                                    .order_by(Reservations.start_date)
+                                    .execution_options(yield_per=1000))
+        # Rows arrive sorted by start date, so every index can be built in the same pass
+        self.reservations = []
+        self._week_counts = Counter()
+        self._by_date = defaultdict(list)
+        for name, start_dt, end_dt in rows:
+            reservation = Reservation(name, start_dt, end_dt)
+            self.reservations.append(reservation)
+            self._week_counts[name, reservation.iso_year, reservation.iso_week] += 1
+            self._by_date[reservation.day].append(reservation)
         return None
 
 
@@ -353,7 +563,7 @@ def is_one_hour_from_now(start_dt: datetime) -> bool:
     bool
         True if the reservation is within one hour from the current time, False otherwise.
     """
-    if start_dt - timedelta(hours=1) <= datetime.now():
+    if start_dt - _ONE_HOUR <= _clock():
         input(f'\nYour reservation must be made at least one hour in advance.\n'
               f'Press enter to return to main menu.')
         return True
@@ -405,7 +615,7 @@ if __name__ == '__main__':
 
                     if court.is_date_not_available(usr_date):
                         usr_date = court.next_available_datetime(usr_date)
-                        if validators.agreement(usr_date).lower() != 'yes':
+                        if not validators.agreement_parse(validators.agreement(usr_date)):
                             continue
 
                     available_periods = court.available_periods(usr_date)
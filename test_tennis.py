@@ -1,21 +1,34 @@
 import csv
 import json
+import sqlite3
 from datetime import date, datetime, timedelta
 
 import pytest
-import sys
-from os import remove
 from io import StringIO
 from unittest import mock
 
 import tennis
 import validators
+from models import Reservations
+
+
+@pytest.fixture(autouse=True)
+def no_prompts(monkeypatch):
+    # Answer every "Press enter" prompt; tests that need a specific answer patch input themselves
+    monkeypatch.setattr(tennis, 'input', lambda *args: None, raising=False)
+    monkeypatch.setattr(validators, 'input', lambda *args: None, raising=False)
 
 
 @pytest.fixture
 def tennis_court():
-    court = tennis.TennisCourt()
-    return court
+    # The in-memory engine and its schema are created once and shared by every test,
+    # so each test leaves the reservations table empty for the next one
+    court = tennis.TennisCourt('sqlite://')
+    yield court
+    court.session.rollback()
+    court.session.query(Reservations).delete()
+    court.session.commit()
+    court.session.close()
 
 
 def test_init(tennis_court):
@@ -45,6 +58,13 @@ def test_is_period_overlaps(tennis_court):
     end_dt_5 = start_dt
     assert tennis_court.is_period_overlaps(start_dt_5, end_dt_5) is False
 
+    # Second reservation two hours after the first one, free hour in between
+    next_reservation = tennis.Reservation('Jenny', end_dt + timedelta(hours=1), end_dt + timedelta(hours=2))
+    tennis_court.reservations.append(next_reservation)
+    assert tennis_court.is_period_overlaps(end_dt, end_dt + timedelta(hours=1)) is False
+    assert tennis_court.is_period_overlaps(end_dt, end_dt + timedelta(minutes=61)) is True
+    assert tennis_court.is_period_overlaps(start_dt, end_dt + timedelta(hours=3)) is True
+
 
 def test_is_date_not_available(tennis_court):
     start_dt = datetime.now()
@@ -60,19 +80,15 @@ def test_is_date_not_available(tennis_court):
     assert tennis_court.is_date_not_available(start_dt_3) is False
 
 
-@mock.patch('tennis.input')
-def test_is_two_reservations_per_week(mock_input, tennis_court):
-    mock_input.return_value = None
+def test_is_two_reservations_per_week(tennis_court):
     # Same week: 22.05.2023 - 28.05.2023 as example
     start_dt_1 = datetime(2023, 5, 22, 0, 0)
     end_dt_1 = datetime(2023, 5, 22, 0, 1)
-    reservation_1 = tennis.Reservation('John', start_dt_1, end_dt_1)
-    tennis_court.reservations.append(reservation_1)
+    tennis_court.make_reservation('John', start_dt_1, end_dt_1)
 
     start_dt_2 = datetime(2023, 5, 28, 23, 59)
     end_dt_2 = datetime(2023, 5, 29, 0, 0)
-    reservation_2 = tennis.Reservation('John', start_dt_2, end_dt_2)
-    tennis_court.reservations.append(reservation_2)
+    tennis_court.make_reservation('John', start_dt_2, end_dt_2)
 
     start_dt_3 = datetime(2023, 5, 21, 23, 59)
     assert tennis_court.is_two_reservations_per_week('John', start_dt_3) is False
@@ -86,12 +102,16 @@ def test_is_two_reservations_per_week(mock_input, tennis_court):
     start_dt_6 = datetime(2023, 5, 29, 0, 0)
     assert tennis_court.is_two_reservations_per_week('John', start_dt_6) is False
 
+    # Same week number of another year
+    start_dt_7 = datetime(2024, 5, 22, 0, 0)
+    assert tennis_court.is_two_reservations_per_week('John', start_dt_7) is False
 
-@mock.patch("tennis.datetime")
-@mock.patch("tennis.input")
-def test_is_one_hour_from_now(mock_input, mock_datetime):
-    mock_datetime.now.return_value = datetime(2023, 5, 29, 12, 00)
-    mock_input.return_value = None
+    assert tennis_court.is_reservation_cancelled('John', start_dt_2) is True
+    assert tennis_court.is_two_reservations_per_week('John', start_dt_4) is False
+
+
+def test_is_one_hour_from_now(monkeypatch):
+    monkeypatch.setattr(tennis, '_clock', lambda: datetime(2023, 5, 29, 12, 00))
 
     start_dt_1 = datetime(2023, 5, 29, 12, 59)
     assert tennis.is_one_hour_from_now(start_dt_1) is True
@@ -128,6 +148,10 @@ def test_next_available_date(tennis_court):
     expected_datetime = datetime(2023, 5, 29, 13, 00)
     assert next_available == expected_datetime
 
+    # Reservations ending before the requested time are skipped
+    next_available = tennis_court.next_available_datetime(datetime(2023, 5, 29, 14, 0))
+    assert next_available == datetime(2023, 5, 29, 15, 0)
+
 
 def test_available_periods(tennis_court):
     # reservation from 28.05.2023 12:00 - 13:00 (same day)
@@ -168,6 +192,9 @@ def test_available_periods(tennis_court):
     tennis_court.reservations.append(reservation_5)
     assert tennis_court.available_periods(end_dt_3) == [30, 60, 90]
 
+    # No period available when the court is already reserved at start time
+    assert tennis_court.available_periods(start_dt_1) == []
+
 
 def test_make_reservation(tennis_court):
     # reservation from 28.05.2023 12:00 - 13:00
@@ -196,41 +223,37 @@ def test_make_reservation(tennis_court):
     assert tennis_court.reservations[1].end_date == datetime(2023, 5, 29, 13, 0)
 
 
-@mock.patch('tennis.input')
-def test_is_reservation_cancelled(mock_input, tennis_court):
-    mock_input.return_value = None
+def test_is_reservation_cancelled(tennis_court):
     start_dt = datetime.now()
     end_dt = start_dt + timedelta(hours=1)
     tennis_court.make_reservation('John', start_dt, end_dt)
 
     assert tennis_court.is_reservation_cancelled('John', start_dt) is True
     assert tennis_court.is_reservation_cancelled('Mike', start_dt) is False
+    assert tennis_court.reservations == []
+    assert all(not bucket for bucket in tennis_court._by_date.values())
 
+    # Reservations compare by identity, so equal-looking objects stay distinct and hashable
+    assert tennis.Reservation('John', start_dt, end_dt) != tennis.Reservation('John', start_dt, end_dt)
+    assert len({tennis.Reservation('John', start_dt, end_dt)}) == 1
 
-@mock.patch('tennis.input')
-def test_print_schedule(mock_input, tennis_court):
-    mock_input.return_value = None
+
+def test_print_schedule(tennis_court, capsys):
     start_dt_1 = datetime(2023, 5, 28, 9, 0)
     end_dt_1 = datetime(2023, 5, 28, 10, 0)
-    reservation_1 = tennis.Reservation('John', start_dt_1, end_dt_1)
-    tennis_court.reservations.append(reservation_1)
+    tennis_court.make_reservation('John', start_dt_1, end_dt_1)
 
     start_dt_2 = datetime(2023, 5, 28, 12, 0)
     end_dt_2 = datetime(2023, 5, 28, 14, 0)
-    reservation_2 = tennis.Reservation('Jenny', start_dt_2, end_dt_2)
-    tennis_court.reservations.append(reservation_2)
+    tennis_court.make_reservation('Jenny', start_dt_2, end_dt_2)
 
     start_dt_3 = datetime(2023, 5, 28, 16, 0)
     end_dt_3 = datetime(2023, 5, 28, 17, 0)
-    reservation_3 = tennis.Reservation('Jack', start_dt_3, end_dt_3)
-    tennis_court.reservations.append(reservation_3)
-
-    captured_output = StringIO()
-    sys.stdout = captured_output
+    tennis_court.make_reservation('Jack', start_dt_3, end_dt_3)
 
     tennis_court.print_schedule(date(2023, 5, 28), date(2023, 5, 28))
 
-    output = captured_output.getvalue().strip()
+    output = capsys.readouterr().out.strip()
 
     expected_output = ('Sunday, 28 May, 2023\n'
                        '* John 09:00 - 10:00\n'
@@ -240,29 +263,27 @@ def test_print_schedule(mock_input, tennis_court):
     assert output == expected_output
 
 
-@mock.patch('tennis.input')
-def test_save_schedule_csv(mock_input, tennis_court):
-    mock_input.return_value = None
+def test_save_schedule_csv(tennis_court):
     start_dt_1 = datetime(2023, 5, 28, 9, 0)
     end_dt_1 = datetime(2023, 5, 28, 10, 0)
-    reservation_1 = tennis.Reservation('John', start_dt_1, end_dt_1)
-    tennis_court.reservations.append(reservation_1)
+    tennis_court.make_reservation('John', start_dt_1, end_dt_1)
 
     start_dt_2 = datetime(2023, 5, 28, 12, 0)
     end_dt_2 = datetime(2023, 5, 28, 14, 0)
-    reservation_2 = tennis.Reservation('Alice', start_dt_2, end_dt_2)
-    tennis_court.reservations.append(reservation_2)
+    tennis_court.make_reservation('Alice', start_dt_2, end_dt_2)
 
     start_dt_3 = datetime(2023, 5, 29, 12, 0)
     end_dt_3 = datetime(2023, 5, 29, 13, 0)
-    reservation_3 = tennis.Reservation('Jack', start_dt_3, end_dt_3)
-    tennis_court.reservations.append(reservation_3)
+    tennis_court.make_reservation('Jack', start_dt_3, end_dt_3)
 
-    tennis_court.save_schedule(date(2023, 5, 28), date(2023, 5, 30), 'csv', 'schedule.csv')
+    # Reservations outside the saved range
+    tennis_court.make_reservation('Alan', datetime(2023, 5, 27, 23, 30), datetime(2023, 5, 28, 0, 30))
+    tennis_court.make_reservation('Jenny', datetime(2023, 5, 31, 0, 0), datetime(2023, 5, 31, 1, 0))
 
-    with open('schedule.csv', mode='r', encoding='utf-8') as csv_file:
-        reader = csv.DictReader(csv_file)
-        rows = list(reader)
+    csv_file = StringIO(newline='')
+    tennis_court.save_schedule(date(2023, 5, 28), date(2023, 5, 30), 'csv', csv_file)
+    csv_file.seek(0)
+    rows = list(csv.DictReader(csv_file))
 
     expected_rows = [
         {'name': 'John', 'start_date': '28.05.2023 09:00', 'end_date': '28.05.2023 10:00'},
@@ -270,37 +291,115 @@ def test_save_schedule_csv(mock_input, tennis_court):
         {'name': 'Jack', 'start_date': '29.05.2023 12:00', 'end_date': '29.05.2023 13:00'}
     ]
     assert rows == expected_rows
-    remove('schedule.csv')  # # os.remove()
 
 
-@mock.patch('tennis.input')
-def test_save_schedule_json(mock_input, tennis_court):
-    mock_input.return_value = None
+def test_save_schedule_json(tennis_court):
     start_dt_1 = datetime(2023, 5, 28, 9, 0)
     end_dt_1 = datetime(2023, 5, 28, 10, 0)
-    reservation_1 = tennis.Reservation('John', start_dt_1, end_dt_1)
-    tennis_court.reservations.append(reservation_1)
+    tennis_court.make_reservation('John', start_dt_1, end_dt_1)
 
     start_dt_2 = datetime(2023, 5, 28, 12, 0)
     end_dt_2 = datetime(2023, 5, 28, 14, 0)
-    reservation_2 = tennis.Reservation('Jenny', start_dt_2, end_dt_2)
-    tennis_court.reservations.append(reservation_2)
+    tennis_court.make_reservation('Jenny', start_dt_2, end_dt_2)
 
     start_dt_3 = datetime(2023, 5, 29, 12, 0)
     end_dt_3 = datetime(2023, 5, 29, 13, 0)
-    reservation_3 = tennis.Reservation('Jack', start_dt_3, end_dt_3)
-    tennis_court.reservations.append(reservation_3)
+    tennis_court.make_reservation('Jack', start_dt_3, end_dt_3)
 
-    tennis_court.save_schedule(date(2023, 5, 28), date(2023, 5, 30), 'json', 'schedule.json')
-
-    with open('schedule.json', mode='r', encoding='utf-8') as json_file:
-        saved_data = json.load(json_file)
+    json_file = StringIO()
+    tennis_court.save_schedule(date(2023, 5, 28), date(2023, 5, 30), 'json', json_file)
+    json_file.seek(0)
+    saved_data = json.load(json_file)
 
     expected_data = {'28.05.2023': [{'end_time': '10:00', 'name': 'John', 'start_time': '09:00'},
                                     {'end_time': '14:00', 'name': 'Jenny', 'start_time': '12:00'}],
                      '29.05.2023': [{'end_time': '13:00', 'name': 'Jack', 'start_time': '12:00'}]}
     assert saved_data == expected_data
-    remove('schedule.json')  # os.remove()
+
+
+@mock.patch('tennis.input')
+def test_save_schedule_unsupported_format(mock_input, tennis_court, tmp_path):
+    tennis_court.make_reservation('John', datetime(2023, 5, 28, 9, 0), datetime(2023, 5, 28, 10, 0))
+
+    xml_path = tmp_path / 'out.xml'
+    tennis_court.save_schedule(date(2023, 5, 28), date(2023, 5, 30), 'xml', xml_path)
+    assert not xml_path.exists()
+    assert 'Unsupported file format: xml' in mock_input.call_args.args[0]
+
+    tennis_court.save_schedule(date(2023, 5, 28), date(2023, 5, 30), 'csv', StringIO())
+    assert mock_input.call_args.args[0].startswith('\nSchedule saved successfully!')
+
+
+@mock.patch('tennis.input')
+def test_add_to_database(mock_input, tennis_court):
+    mock_input.return_value = None
+    start_dt_1 = datetime(2023, 5, 28, 9, 0)
+    end_dt_1 = datetime(2023, 5, 28, 10, 0)
+    start_dt_2 = datetime(2023, 5, 29, 9, 0)
+    end_dt_2 = datetime(2023, 5, 29, 10, 0)
+    tennis_court.add_to_database('John', start_dt_2, end_dt_2, commit=False)
+    tennis_court.add_to_database('Jenny', start_dt_1, end_dt_1)
+    mock_input.assert_called_once()
+
+    tennis_court.load_schedule_from_database()
+    assert [reservation.name for reservation in tennis_court.reservations] == ['Jenny', 'John']
+    assert tennis_court.is_date_not_available(start_dt_2) is True
+
+
+def test_add_many_to_database(tennis_court):
+    tennis_court.add_many_to_database([])
+    tennis_court.load_schedule_from_database()
+    assert tennis_court.reservations == []
+
+    tennis_court.add_many_to_database([
+        ('John', datetime(2023, 5, 29, 9, 0), datetime(2023, 5, 29, 10, 0)),
+        ('Jenny', datetime(2023, 5, 28, 9, 0), datetime(2023, 5, 28, 10, 30)),
+    ])
+    tennis_court.load_schedule_from_database()
+    assert [reservation.name for reservation in tennis_court.reservations] == ['Jenny', 'John']
+    assert tennis_court.reservations[0].end_date == datetime(2023, 5, 28, 10, 30)
+
+
+def test_init_with_duplicate_rows(tmp_path):
+    # A database from before the indexes were added, holding the same reservation twice
+    db_path = tmp_path / 'duplicates.db'
+    with sqlite3.connect(db_path) as connection:
+        connection.execute('CREATE TABLE reservations (reservation_id INTEGER PRIMARY KEY, name VARCHAR(60), '
+                           'start_datetime DATETIME, end_datetime DATETIME)')
+        connection.executemany('INSERT INTO reservations (name, start_datetime, end_datetime) VALUES (?, ?, ?)',
+                               [('John', '2023-05-28 09:00:00.000000', '2023-05-28 10:00:00.000000')] * 2)
+    connection.close()
+
+    court = tennis.TennisCourt(f'sqlite:///{db_path}')
+    court.load_schedule_from_database()
+    assert [reservation.name for reservation in court.reservations] == ['John', 'John']
+    court.session.close()
+
+
+def test_subtract_from_database(tennis_court):
+    start_dt = datetime(2023, 5, 28, 9, 0)
+    end_dt = datetime(2023, 5, 28, 10, 0)
+    tennis_court.add_to_database('John', start_dt, end_dt)
+    tennis_court.add_to_database('Jenny', end_dt, end_dt + timedelta(hours=1))
+
+    tennis_court.subtract_from_database('John', start_dt)
+    tennis_court.load_schedule_from_database()
+    assert [reservation.name for reservation in tennis_court.reservations] == ['Jenny']
+
+
+def test_subtract_from_database_duplicate_rows(tennis_court):
+    start_dt = datetime(2023, 5, 28, 9, 0)
+    end_dt = datetime(2023, 5, 28, 10, 0)
+    tennis_court.add_many_to_database([('John', start_dt, end_dt), ('John', start_dt, end_dt)])
+    tennis_court.load_schedule_from_database()
+
+    assert tennis_court.is_reservation_cancelled('John', start_dt) is True
+    tennis_court.subtract_from_database('John', start_dt)
+    assert [reservation.name for reservation in tennis_court.reservations] == ['John']
+    assert tennis_court.session.query(Reservations).count() == 1
+
+    tennis_court.load_schedule_from_database()
+    assert [reservation.name for reservation in tennis_court.reservations] == ['John']
 
 
 @mock.patch("tennis.input")
@@ -323,6 +422,12 @@ def test_name_validation(mock_input):
     mock_input.return_value = ''
     assert validators.name_validation('test') is None
 
+    mock_input.return_value = ' John\n'
+    assert validators.name_validation('test') == 'John'
+
+    mock_input.return_value = '   '
+    assert validators.name_validation('test') is None
+
 
 @mock.patch("validators.input")
 def test_datetime_validation(mock_input):
@@ -330,6 +435,9 @@ def test_datetime_validation(mock_input):
     expected_datetime = datetime(2023, 5, 29, 12, 0)
     assert validators.datetime_validation('test') == expected_datetime
 
+    mock_input.return_value = ' 29.05.2023 12:00 '
+    assert validators.datetime_validation('test') == expected_datetime
+
     mock_input.return_value = '29.05.2023 02:01'
     expected_datetime = datetime(2023, 5, 29, 2, 1)
     assert validators.datetime_validation('test') == expected_datetime
@@ -349,6 +457,9 @@ def test_datetime_validation(mock_input):
     mock_input.return_value = 'invalid datetime'
     assert validators.datetime_validation('test') is None
 
+    mock_input.return_value = '٢٩.٠٥.٢٠٢٣ ١٢:٠٠'
+    assert validators.datetime_validation('test') is None
+
 
 @mock.patch("validators.input")
 def test_date_validation(mock_input):
@@ -356,6 +467,9 @@ def test_date_validation(mock_input):
     expected_date = datetime(2023, 5, 29).date()
     assert validators.date_validation('test') == expected_date
 
+    mock_input.return_value = '29.05.2023 '
+    assert validators.date_validation('test') == expected_date
+
     mock_input.return_value = '01.05.2023'
     expected_date = datetime(2023, 5, 1).date()
     assert validators.date_validation('test') == expected_date
@@ -369,6 +483,9 @@ def test_date_validation(mock_input):
     mock_input.return_value = 'invalid date'
     assert validators.date_validation('test') is None
 
+    mock_input.return_value = '٢٩.٠٥.٢٠٢٣'
+    assert validators.date_validation('test') is None
+
 
 @mock.patch("validators.input")
 def test_period_validation(mock_input):
@@ -379,6 +496,12 @@ def test_period_validation(mock_input):
     mock_input.return_value = '5'
     assert validators.period_validation(available_periods) is None
 
+    mock_input.return_value = ' 3 '
+    assert validators.period_validation(available_periods) == 3
+
+    mock_input.return_value = 'two'
+    assert validators.period_validation(available_periods) is None
+
 
 @mock.patch("validators.input")
 def test_agreement(mock_input):
@@ -389,6 +512,19 @@ def test_agreement(mock_input):
     assert validators.agreement(datetime(2023, 5, 29)) == 'no'
 
 
+def test_agreement_prompt():
+    prompt = validators.agreement_prompt(datetime(2023, 5, 29, 12, 30))
+    assert '2023-05-29 12:30:00' in prompt
+    assert prompt.endswith('(yes/no)\n\n$ ')
+
+
+def test_agreement_parse():
+    assert validators.agreement_parse('yes') is True
+    assert validators.agreement_parse(' Yes\n') is True
+    assert validators.agreement_parse('no') is False
+    assert validators.agreement_parse('') is False
+
+
 @mock.patch("validators.input")
 def test_validation_file_type(mock_input):
     mock_input.return_value = 'json'
@@ -397,5 +533,11 @@ def test_validation_file_type(mock_input):
     mock_input.return_value = 'csv'
     assert validators.validation_file_type() == 'csv'
 
+    mock_input.return_value = 'JSON'
+    assert validators.validation_file_type() == 'json'
+
+    mock_input.return_value = ' csv '
+    assert validators.validation_file_type() == 'csv'
+
     mock_input.return_value = 'txt'
     assert validators.validation_file_type() is None
@@ -1,7 +1,24 @@
-from datetime import datetime
+from datetime import date, datetime
+from typing import Collection, Optional
 
-from re import fullmatch
-from typing import Optional
+_FILE_TYPES = frozenset(('json', 'csv'))
+
+
+def _fail(message: str) -> None:
+    """
+    Shows an error message and waits for the user to return to the main menu.
+
+    Parameters
+    ----------
+    message : str
+        The error message followed by the instruction to press enter.
+
+    Returns
+    -------
+    None
+    """
+    input(message)
+    return None
 
 
 def name_validation(question_name: str) -> Optional[str]:
@@ -18,11 +35,10 @@ def name_validation(question_name: str) -> Optional[str]:
     str or None
         The user's name if valid, or None if empty string.
     """
-    name = input(f"\nWhat's {question_name}?\n\n$ ")
+    name = input(f"\nWhat's {question_name}?\n\n$ ").strip()
     if name == '':
-        input('Invalid name.\n'
-              'Press enter to return to main menu.')
-        return None
+        return _fail('Invalid name.\n'
+                     'Press enter to return to main menu.')
     return name
 
 
@@ -41,21 +57,25 @@ def datetime_validation(question_name: str) -> Optional[datetime]:
     datetime or None
         The reservation date and time as a datetime.datetime object if valid, or None if invalid.
     """
-    pattern = r"\d{2}\.\d{2}\.\d{4} \d{2}:\d{2}"
     usr_datetime = input(f"\nEnter the date and time for which you would like to {question_name} a reservation? "
-                         "{DD.MM.YYYY HH:MM}\n\n$ ")
-    if fullmatch(pattern, usr_datetime):
+                         "{DD.MM.YYYY HH:MM}\n\n$ ").strip()
+    # Fixed dd.mm.yyyy hh:mm layout: check the separators and digit fields by position.
+    # isdecimal() alone also passes non-ASCII digits such as '٢', so require ASCII first
+    if (usr_datetime.isascii() and len(usr_datetime) == 16 and usr_datetime[2] == usr_datetime[5] == '.'
+            and usr_datetime[10] == ' ' and usr_datetime[13] == ':'
+            and (usr_datetime[:2] + usr_datetime[3:5] + usr_datetime[6:10]
+                 + usr_datetime[11:13] + usr_datetime[14:]).isdecimal()):
+        day, month, year = int(usr_datetime[:2]), int(usr_datetime[3:5]), int(usr_datetime[6:10])
+        hour, minute = int(usr_datetime[11:13]), int(usr_datetime[14:])
         try:
-            usr_datetime = datetime.strptime(usr_datetime, "%d.%m.%Y %H:%M")
+            usr_datetime = datetime(year, month, day, hour, minute)
             return usr_datetime
         except ValueError:
-            input(f'Chosen date and time do not exist in Gregorian calendar.\n'
-                  f'Press enter to return to main menu.')
-            return None
+            return _fail('Chosen date and time do not exist in Gregorian calendar.\n'
+                         'Press enter to return to main menu.')
     else:
-        input(f'Invalid date format.\n'
-              f'Press enter to return to main menu.')
-        return None
+        return _fail('Invalid date format.\n'
+                     'Press enter to return to main menu.')
 
 
 def date_validation(question_name: str) -> Optional[datetime.date]:
@@ -73,48 +93,82 @@ def date_validation(question_name: str) -> Optional[datetime.date]:
     datetime.date or None
         The reservation start date as a date object if valid, or None if invalid.
     """
-    pattern = r"\d{2}\.\d{2}\.\d{4}"
-    user_date = input(f'\nPlease enter the {question_name} date {{DD.MM.YYYY}}\n\n$ ')
-    if fullmatch(pattern, user_date):
+    user_date = input(f'\nPlease enter the {question_name} date {{DD.MM.YYYY}}\n\n$ ').strip()
+    # Fixed dd.mm.yyyy layout: check the separators and digit fields by position.
+    # isdecimal() alone also passes non-ASCII digits such as '٢', so require ASCII first
+    if (user_date.isascii() and len(user_date) == 10 and user_date[2] == user_date[5] == '.'
+            and (user_date[:2] + user_date[3:5] + user_date[6:]).isdecimal()):
+        day, month, year = int(user_date[:2]), int(user_date[3:5]), int(user_date[6:])
         try:
-            user_date = datetime.strptime(user_date, "%d.%m.%Y").date()
+            user_date = date(year, month, day)
             return user_date
         except ValueError:
-            input(f'Chosen date does not exist in Gregorian calendar.\n'
-                  f'Press enter to return to main menu.')
-            return None
+            return _fail('Chosen date does not exist in Gregorian calendar.\n'
+                         'Press enter to return to main menu.')
     else:
-        input(f'Invalid date format.\n'
-              f'Press enter to return to main menu.')
-        return None
+        return _fail('Invalid date format.\n'
+                     'Press enter to return to main menu.')
 
 
-def period_validation(avl_periods: list[int]) -> Optional[int]:
+def period_validation(avl_periods: Collection[int]) -> Optional[int]:
     """
     Validates the user's input for the chosen reservation period.
 
     Parameters
     ----------
-    avl_periods : list[int]
-        A list of available reservation periods.
+    avl_periods : Collection[int]
+        The available reservation periods.
 
     Returns
     -------
     int or None
         The user's chosen reservation period if valid, or None if invalid.
     """
-    try:
-        user_chosen_period = int(input(f'\n$ '))
-        if user_chosen_period in avl_periods:
-            return user_chosen_period
-    except ValueError:
-        input(f'Chosen period must be a number.\n'
-              f'Press enter to return to the main menu.')
-        return None
-    else:
-        input(f'Chosen period not available.\n'
-              f'Press enter to return to the main menu.')
-        return None
+    user_input = input('\n$ ').strip()
+    if not user_input.isdecimal():
+        return _fail('Chosen period must be a number.\n'
+                     'Press enter to return to the main menu.')
+    user_chosen_period = int(user_input)
+    if user_chosen_period in avl_periods:
+        return user_chosen_period
+    return _fail('Chosen period not available.\n'
+                 'Press enter to return to the main menu.')
+
+
+def agreement_prompt(datetime_of_next_reservation: datetime) -> str:
+    """
+    Builds the question offering the user an alternative reservation date and time.
+
+    Parameters
+    ----------
+    datetime_of_next_reservation : datetime.datetime
+        The alternative reservation date related to the input question.
+
+    Returns
+    -------
+    str
+        The question to show the user.
+    """
+    return ('The time you chose is unavailable.\n'
+            'Would you like to make a reservation for '
+            f'{datetime_of_next_reservation} instead?(yes/no)\n\n$ ')
+
+
+def agreement_parse(answer: str) -> bool:
+    """
+    Interprets the user's answer to the agreement question.
+
+    Parameters
+    ----------
+    answer : str
+        The user's answer, in any letter case and with surrounding whitespace allowed.
+
+    Returns
+    -------
+    bool
+        True if the user agreed ('yes'), False otherwise.
+    """
+    return answer.strip().lower() == 'yes'
 
 
 def agreement(datetime_of_next_reservation: datetime) -> str:
@@ -131,9 +185,7 @@ def agreement(datetime_of_next_reservation: datetime) -> str:
     str
         The user's agreement choice as a string.
     """
-    user_agreement = input(f'The time you chose is unavailable.\n'
-                           f'Would you like to make a reservation for '
-                           f'{datetime_of_next_reservation} instead?(yes/no)\n\n$ ')
+    user_agreement = input(agreement_prompt(datetime_of_next_reservation))
     return user_agreement
 
 
@@ -147,10 +199,8 @@ def validation_file_type() -> Optional[str]:
         The user's chosen file type ('json' or 'csv') if it is valid,
         or None if the input is invalid.
     """
-    available_file_types = ('json', 'csv')
-    user_file_type = input('\nPlease enter type of the file (json/csv)\n\n$ ')
-    if user_file_type not in available_file_types:
-        input('Invalid file format\n'
-              'Press enter to return to main menu.')
-        return None
+    user_file_type = input('\nPlease enter type of the file (json/csv)\n\n$ ').strip().lower()
+    if user_file_type not in _FILE_TYPES:
+        return _fail('Invalid file format\n'
+                     'Press enter to return to main menu.')
     return user_file_type